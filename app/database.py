@@ -4,14 +4,30 @@ from pathlib import Path
 from alembic import command
 from alembic.config import Config
 from sqlalchemy import create_engine, event
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.config import get_settings
 
 
 settings = get_settings()
-engine = create_engine(settings.database_url, echo=settings.debug, future=True)
+
+
+def _engine_options(database_url: str) -> dict:
+    """Return extra engine options required by the configured database."""
+
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # An in-memory SQLite database lives and dies with its connection, so every
+        # checkout (from any thread) must share the same one.
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    return {}
+
+
+engine = create_engine(
+    settings.database_url, echo=settings.debug, future=True, **_engine_options(settings.database_url)
+)
 
 
 @event.listens_for(Engine, "connect")
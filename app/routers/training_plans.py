@@ -5,7 +5,7 @@ import logging
 from datetime import date, datetime, timedelta
 from typing import Annotated
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session, joinedload
 
 from app.database import get_db
@@ -154,15 +154,21 @@ async def get_plan_by_id(
 async def generate_training_plan(
     plan_request: TrainingPlanCreate,
     db: Annotated[Session, Depends(get_db)],
+    include_workouts: Annotated[
+        bool, Query(description="Return the generated workouts; false returns an empty workouts list")
+    ] = True,
 ):
     """
     Generate a new AI-powered training plan.
 
     Args:
         plan_request: Plan generation parameters (goal, dates, fitness level, volume)
+        include_workouts: When false, the workouts are still created but the response
+            carries an empty ``workouts`` list; fetch them with GET /plans/{plan_id}
 
     Returns:
-        TrainingPlanWithWorkouts: Generated plan with all workouts
+        TrainingPlanWithWorkouts: Generated plan, with all of its workouts unless
+        ``include_workouts`` is false
     """
     try:
         # Validate dates
@@ -212,7 +218,7 @@ async def generate_training_plan(
             if workout_type == "rest":
                 target_duration = None
                 target_distance = None
-                intensity = 0
+                intensity = None
                 description = "Rest and recovery day"
             elif workout_type == "easy_run":
                 target_duration = 45
@@ -270,7 +276,7 @@ async def generate_training_plan(
             "created_by_ai": new_plan.created_by_ai,
             "created_at": new_plan.created_at,
             "updated_at": new_plan.updated_at,
-            "workouts": sorted(workouts, key=lambda w: w.date),
+            "workouts": sorted(workouts, key=lambda w: w.date) if include_workouts else [],
         }
 
         logger.info(
@@ -2054,7 +2054,8 @@ class AIAnalyzer:
 
         return None
 
-    def _format_recovery_for_prompt(self, recovery: dict[str, Any] | None) -> str:
+    @staticmethod
+    def _format_recovery_for_prompt(recovery: dict[str, Any] | None) -> str:
         if not recovery:
             return "Not available"
 
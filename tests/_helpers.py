@@ -0,0 +1,152 @@
+"""Plain helpers shared by test modules; fixtures live in conftest.py."""
+from __future__ import annotations
+
+import json
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.models.database_models import PlannedWorkout, TrainingPlan
+from app.services import ai_analyzer
+from app.services.ai_analyzer import AIAnalyzer
+
+
+def seed_plan(
+    session: Session,
+    *,
+    name: str,
+    goal: str,
+    start: date,
+    active: bool = True,
+    n_workouts: int = 14,
+) -> TrainingPlan:
+    """Insert a plan with ``n_workouts`` daily easy runs from ``start``.
+
+    Seeding an active plan deactivates the others, matching the generate endpoint.
+    """
+
+    if active:
+        session.query(TrainingPlan).filter(TrainingPlan.is_active.is_(True)).update({"is_active": False})
+    plan = TrainingPlan(
+        name=name,
+        goal=goal,
+        start_date=start,
+        target_date=start + timedelta(days=max(n_workouts, 1)),
+        is_active=active,
+        created_by_ai=True,
+    )
+    plan.workouts = [
+        PlannedWorkout(
+            date=start + timedelta(days=offset),
+            workout_type="easy_run",
+            description="Easy conversational pace",
+            target_duration_minutes=45,
+            target_distance_meters=6000,
+            intensity_level=3,
+        )
+        for offset in range(n_workouts)
+    ]
+    session.add(plan)
+    session.commit()
+    return plan
+
+
+def mark_workout_complete(session: Session, workout_id: int, completed_at: datetime) -> PlannedWorkout:
+    """Mark a planned workout complete at ``completed_at`` without going through the API."""
+
+    workout = session.get(PlannedWorkout, workout_id)
+    workout.was_completed = True
+    workout.completed_at = completed_at
+    session.commit()
+    return workout
+
+
+@contextmanager
+def count_queries() -> Iterator[List[str]]:
+    """Collect every SQL statement the application engine executes inside the block.
+
+    The BEGIN that conftest emits on the test engine is transaction plumbing, not a
+    query, and is left out.
+    """
+
+    statements: List[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement != "BEGIN":
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+
+# Analyzer settings for tests that patch app.services.ai_analyzer.get_settings
+DUMMY_SETTINGS = SimpleNamespace(
+    anthropic_api_key="test-key",
+    garmin_email="test@example.com",
+    garmin_password="hunter2",
+    garmin_token_store=None,
+    prompt_config_path=Path("app/config/prompts.yaml"),
+)
+
+
+class StubGarminService:
+    """Offline stand-in for GarminService used by analyzer tests."""
+
+    def login(self, *args: Any, **kwargs: Any) -> None:
+        return None
+
+    def logout(self) -> None:
+        return None
+
+    def get_personal_info(self) -> Dict[str, Any]:
+        return {"age": 30, "max_hr": 190, "lactate_threshold_hr": 160}
+
+
+def install_stub_analyzer(
+    mp: pytest.MonkeyPatch,
+    garmin_data: Dict[str, Any] | None,
+    anthropic_payload: Dict[str, Any] | str,
+    *,
+    garmin_service: type = StubGarminService,
+    latest_sync: str | None = None,
+) -> List[str]:
+    """Stub every external dependency of ``AIAnalyzer.analyze_daily_readiness``.
+
+    Patches the Garmin service, Garmin data fetch (skipped when ``garmin_data`` is
+    None so the real fetch runs against ``garmin_service``), historical lookups and
+    the Anthropic client. ``anthropic_payload`` may be pre-serialized JSON text.
+    Returns the list that collects every prompt sent to Claude.
+    """
+
+    if not isinstance(anthropic_payload, str):
+        anthropic_payload = json.dumps(anthropic_payload)
+    prompts: List[str] = []
+    response = SimpleNamespace(content=[SimpleNamespace(text=anthropic_payload)])
+
+    class StubMessages:
+        def create(self, **kwargs: Any) -> SimpleNamespace:
+            prompts.append(kwargs["messages"][0]["content"])
+            return response
+
+    class StubAnthropic:
+        def __init__(self, api_key: str) -> None:
+            self.messages = StubMessages()
+
+    mp.setattr(ai_analyzer, "GarminService", garmin_service)
+    mp.setattr(ai_analyzer, "Anthropic", StubAnthropic)
+    if garmin_data is not None:
+        mp.setattr(AIAnalyzer, "_fetch_garmin_data", lambda self, garmin, target_date: garmin_data)
+    mp.setattr(AIAnalyzer, "_get_historical_baselines", lambda self, target_date: None)
+    mp.setattr(AIAnalyzer, "_get_readiness_history", lambda self, target_date, days=7: [])
+    mp.setattr(AIAnalyzer, "_get_latest_metric_sync", lambda self: latest_sync)
+    return prompts
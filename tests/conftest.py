@@ -4,25 +4,51 @@ from __future__ import annotations
 import json
 import os
 from pathlib import Path
-from typing import Any, AsyncGenerator, Dict
+from typing import Any, AsyncGenerator, Dict, Iterator
 
 import pytest
 from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
 
 os.environ["SECRET_KEY"] = os.environ.get("SECRET_KEY") or "test-secret-key"
 os.environ["GARMIN_EMAIL"] = os.environ.get("GARMIN_EMAIL") or "test@example.com"
 os.environ["GARMIN_PASSWORD"] = os.environ.get("GARMIN_PASSWORD") or "hunter2"
 os.environ["ANTHROPIC_API_KEY"] = os.environ.get("ANTHROPIC_API_KEY") or "test-anthropic-key"
+# Tests never touch the on-disk database; each worker gets a private in-memory one.
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
 
 from app.logging_config import configure_logging
 
 configure_logging()
 
+from app.database import Base, SessionLocal, engine, get_db
 from app.main import app
 
 FIXTURES_DIR = Path(__file__).parent / "fixtures"
 
 
+# SQLAlchemy's pysqlite SAVEPOINT recipe: the driver's own transaction handling
+# never emits BEGIN and commits on RELEASE SAVEPOINT, so db_session could not
+# roll back. Switch it off and let SQLAlchemy emit BEGIN itself.
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_begin(dbapi_connection, connection_record) -> None:
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def _emit_begin(conn) -> None:
+    conn.exec_driver_sql("BEGIN")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _create_schema() -> None:
+    """Create every table in the in-memory test database once per session."""
+
+    Base.metadata.create_all(engine)
+
+
 @pytest.fixture(scope="session")
 def test_client() -> TestClient:
     """Provide a FastAPI test client."""
@@ -30,6 +56,14 @@ def test_client() -> TestClient:
     return TestClient(app)
 
 
+@pytest.fixture(scope="session")
+async def async_client() -> AsyncGenerator[AsyncClient, None]:
+    """Provide an httpx client that calls the app in-process over ASGI."""
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
 @pytest.fixture(scope="session")
 def garmin_fixture() -> Dict[str, Any]:
     """Return Garmin daily metrics fixture data."""
@@ -44,3 +78,46 @@ def anthropic_fixture() -> Dict[str, Any]:
 
     with (FIXTURES_DIR / "anthropic_response.json").open("r", encoding="utf-8") as fh:
         return json.load(fh)
+
+
+@pytest.fixture
+def db_session(monkeypatch: pytest.MonkeyPatch) -> Iterator[Session]:
+    """Yield a session whose work is rolled back when the test finishes.
+
+    The session joins an outer transaction on a dedicated connection; its own
+    ``commit()`` calls only release SAVEPOINTs, so nothing reaches the database.
+    Sessions the app opens through ``SessionLocal`` get the same settings for the
+    test: with the in-memory StaticPool, a session checking the shared connection
+    in and out would reset it with a ROLLBACK and discard the test transaction.
+    """
+
+    connection = engine.connect()
+    transaction = connection.begin()
+    TestSession = sessionmaker(
+        **{**SessionLocal.kw, "bind": connection, "join_transaction_mode": "create_savepoint"}
+    )
+    monkeypatch.setattr(SessionLocal, "kw", TestSession.kw)
+    session = TestSession()
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def override_get_db(db_session: Session) -> Iterator[Session]:
+    """Route the app's ``get_db`` dependency to ``db_session`` for one test.
+
+    Everything the API writes during the test is rolled back with the session.
+    """
+
+    def _get_test_db() -> Iterator[Session]:
+        yield db_session
+
+    app.dependency_overrides[get_db] = _get_test_db
+    try:
+        yield db_session
+    finally:
+        app.dependency_overrides.pop(get_db, None)
@@ -9,7 +9,6 @@ import pytest
 from app.services.ai_analyzer import AIAnalyzer
 
 
-@pytest.mark.asyncio
 async def test_analyze_daily_readiness_returns_placeholder(monkeypatch: pytest.MonkeyPatch):
     class DummySettings:
         anthropic_api_key = "test-key"
@@ -1,114 +1,146 @@
 """Integration tests for Phase 2 detailed activity metrics with AI analyzer."""
 import json
+import re
 from datetime import date, datetime
-from types import SimpleNamespace
-from pathlib import Path
 
 import pytest
+from sqlalchemy import delete, insert, select
 
+from app.database import SessionLocal
+from app.models.database_models import DailyMetric
 from app.services.ai_analyzer import AIAnalyzer
-
-
-@pytest.mark.asyncio
-async def test_ai_analyzer_with_detail_metrics(monkeypatch: pytest.MonkeyPatch, tmp_path):
-    """Test that AI analyzer correctly integrates Phase 2 detail metrics."""
-
-    # Setup test configuration
-    class DummySettings:
-        anthropic_api_key = "test-key"
-        garmin_email = "test@example.com"
-        garmin_password = "hunter2"
-        garmin_token_store = None
-        prompt_config_path = Path("app/config/prompts.yaml")
-
-    monkeypatch.setattr("app.services.ai_analyzer.get_settings", lambda: DummySettings())
-
-    # Mock Garmin service
-    class DummyGarminService:
-        def login(self, *args, **kwargs) -> None:
-            return None
-
-        def logout(self) -> None:
-            return None
-
-        def get_personal_info(self) -> dict:
-            return {
-                "age": 30,
-                "max_hr": 190,
-                "lactate_threshold_hr": 160,
-            }
-
-    # Mock Garmin client methods instead of the entire service
-    class DummyGarminClient:
-        def get_stats(self, date_str):
-            return {"totalSteps": 8000, "activeKilocalories": 500}
-
-        def get_sleep_data(self, date_str):
-            return {
-                "dailySleepDTO": {
-                    "sleepTimeSeconds": 28800,
-                    "sleepScores": {"overall": {"value": 82}}
-                }
-            }
-
-        def get_hrv_data(self, date_str):
-            return {
-                "hrvSummary": {
-                    "lastNightAvg": 55,
-                    "weeklyAvg": 52
-                }
+from tests._helpers import DUMMY_SETTINGS, StubGarminService, install_stub_analyzer
+
+# DailyMetric rows matching fixtures/garmin_daily_metrics.json, inserted via Core
+_FIXTURE_METRIC_ROW = {
+    "recovery_time_hours": 14,
+    "resting_hr": 44,
+    "hrv_morning": 48,
+    "sleep_seconds": 25500,
+    "sleep_score": 82,
+    "training_readiness_score": 67,
+    "vo2_max": 54.3,
+    "training_status": "PRODUCTIVE",
+}
+_STORED_METRIC_ROW = {"recovery_time_hours": 14, "resting_hr": 44, "hrv_morning": 48}
+
+# Mock Anthropic responses, serialized once at import
+_SAMPLE_AI_TEXT = json.dumps({
+    "readiness_score": 78,
+    "recommendation": "moderate",
+    "confidence": "high",
+    "key_factors": [
+        "Good pace consistency (87/100) indicates strong pacing control",
+        "Normal HR drift (3.2%) suggests efficient cardiovascular response",
+        "Weather conditions (22°C, 65% humidity) were favorable"
+    ],
+    "red_flags": [],
+    "suggested_workout": {
+        "type": "tempo_run",
+        "description": "40 min tempo run at Zone 3 (150-160 bpm)",
+        "target_duration_minutes": 40,
+        "intensity": 6,
+        "rationale": "Recent workout shows good pacing and efficiency, ready for moderate intensity"
+    },
+    "recovery_tips": ["Continue monitoring HR drift", "Maintain hydration in current weather"],
+    "ai_reasoning": "Detailed metrics show excellent pacing and normal cardiovascular response"
+})
+
+_RECOVERY_AI_TEXT = json.dumps({
+    "readiness_score": 70,
+    "recommendation": "moderate",
+    "confidence": "high",
+    "key_factors": [
+        "Recovery time: 14 hours - moderate intensity recommended"
+    ],
+    "suggested_workout": {
+        "type": "easy_run",
+        "description": "30 min easy run",
+        "target_duration_minutes": 30,
+    },
+})
+
+# Garmin data matching fixtures/garmin_daily_metrics.json for the recovery flow
+_RECOVERY_GARMIN_DATA = {
+    "stats": {"totalSteps": 12345},
+    "heart_rate": {"restingHeartRate": 44},
+    "hrv": {"hrvSummary": {"lastNightAvg": 48}},
+    "sleep": {
+        "dailySleepDTO": {
+            "sleepTimeSeconds": 25500,
+            "sleepScores": {"overall": {"value": 82}},
+        }
+    },
+    "training_readiness": [{"score": 67}],
+    "training_status": {
+        "currentRecoveryTime": 14,  # Fixture value
+        "mostRecentVO2Max": {"generic": {"vo2MaxValue": 54.3}},
+        "mostRecentTrainingStatus": {
+            "latestTrainingStatusData": {
+                "device1": {"trainingStatusFeedbackPhrase": "PRODUCTIVE"}
             }
+        },
+    },
+    "recent_activities": [],
+}
+
+
+# Garmin client responses by method name; unlisted endpoints return an empty dict
+_RESPONSES = {
+    "get_stats": {"totalSteps": 8000, "activeKilocalories": 500},
+    "get_sleep_data": {
+        "dailySleepDTO": {
+            "sleepTimeSeconds": 28800,
+            "sleepScores": {"overall": {"value": 82}},
+        }
+    },
+    "get_hrv_data": {"hrvSummary": {"lastNightAvg": 55, "weeklyAvg": 52}},
+    "get_heart_rates": {"restingHeartRate": 52, "maxHeartRate": 180},
+    "get_stress_data": [{"stressLevel": 25}],
+    "get_body_battery": [{"charged": 60, "drained": 40}],
+    "get_training_readiness": [{"score": 75}],
+    "get_activities": [
+        {
+            "activityId": 12345678,
+            "activityType": {"typeKey": "running"},
+            "startTimeLocal": "2025-01-15T08:00:00",
+            "duration": 1800,
+            "distance": 5000,
+            "averageHR": 155,
+            "maxHR": 170,
+            "aerobicTrainingEffect": 3.2,
+            "anaerobicTrainingEffect": 1.5,
+        }
+    ],
+}
 
-        def get_heart_rates(self, date_str):
-            return {
-                "restingHeartRate": 52,
-                "maxHeartRate": 180
-            }
 
-        def get_stress_data(self, date_str):
-            return [{"stressLevel": 25}]
+class _DummyGarminClient:
+    """Garmin client stub answering every getter from ``_RESPONSES``."""
 
-        def get_body_battery(self, date_str):
-            return [{"charged": 60, "drained": 40}]
+    def __getattr__(self, name):
+        payload = _RESPONSES.get(name, {})
+        return lambda *args, **kwargs: payload
 
-        def get_training_readiness(self, date_str):
-            return [{"score": 75}]
 
-        def get_training_status(self, date_str):
-            return {}
+class _DummyGarminService(StubGarminService):
+    """Garmin service stub wired to ``_DummyGarminClient`` at construction."""
 
-        def get_spo2_data(self, date_str):
-            return {}
+    def __init__(self, *args, **kwargs) -> None:
+        self._client = _DummyGarminClient()
 
-        def get_respiration_data(self, date_str):
-            return {}
 
-        def get_hydration_data(self, date_str):
-            return {}
+@pytest.fixture(autouse=True, scope="module")
+def _dummy_settings():
+    """Patch analyzer settings once for every test in this module."""
 
-        def get_activities(self, start, limit):
-            # Return activity with recent date
-            return [
-                {
-                    "activityId": 12345678,
-                    "activityType": {"typeKey": "running"},
-                    "startTimeLocal": "2025-01-15T08:00:00",
-                    "duration": 1800,
-                    "distance": 5000,
-                    "averageHR": 155,
-                    "maxHR": 170,
-                    "aerobicTrainingEffect": 3.2,
-                    "anaerobicTrainingEffect": 1.5
-                }
-            ]
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("app.services.ai_analyzer.get_settings", lambda: DUMMY_SETTINGS)
+        yield
 
-    # Patch the GarminService to use our dummy client
-    original_garmin_init = DummyGarminService.__init__
-    def patched_init(self, *args, **kwargs):
-        self._client = DummyGarminClient()
 
-    DummyGarminService.__init__ = patched_init
-    monkeypatch.setattr("app.services.ai_analyzer.GarminService", DummyGarminService)
+async def test_ai_analyzer_with_detail_metrics(monkeypatch: pytest.MonkeyPatch):
+    """Test that AI analyzer correctly integrates Phase 2 detail metrics."""
 
     # Mock _fetch_activity_detail_metrics to return test data
     def mock_fetch_detail_metrics(self, activity_id):
@@ -123,56 +155,9 @@ async def test_ai_analyzer_with_detail_metrics(monkeypatch: pytest.MonkeyPatch,
 
     monkeypatch.setattr(AIAnalyzer, "_fetch_activity_detail_metrics", mock_fetch_detail_metrics)
 
-    # Mock Anthropic API
-    sample_ai_payload = {
-        "readiness_score": 78,
-        "recommendation": "moderate",
-        "confidence": "high",
-        "key_factors": [
-            "Good pace consistency (87/100) indicates strong pacing control",
-            "Normal HR drift (3.2%) suggests efficient cardiovascular response",
-            "Weather conditions (22°C, 65% humidity) were favorable"
-        ],
-        "red_flags": [],
-        "suggested_workout": {
-            "type": "tempo_run",
-            "description": "40 min tempo run at Zone 3 (150-160 bpm)",
-            "target_duration_minutes": 40,
-            "intensity": 6,
-            "rationale": "Recent workout shows good pacing and efficiency, ready for moderate intensity"
-        },
-        "recovery_tips": ["Continue monitoring HR drift", "Maintain hydration in current weather"],
-        "ai_reasoning": "Detailed metrics show excellent pacing and normal cardiovascular response"
-    }
-
-    class DummyMessages:
-        def create(self, **kwargs):
-            # Verify that detail metrics are in the prompt
-            prompt = kwargs["messages"][0]["content"]
-            # Be more lenient in checking - just verify key elements are present
-            has_details = "DETAILED PERFORMANCE BREAKDOWN" in prompt
-            has_pace = "Pace consistency" in prompt or "pace consistency" in prompt
-            has_drift = "HR drift" in prompt or "hr drift" in prompt
-
-            # For debugging if test fails
-            if not (has_details and has_pace and has_drift):
-                print(f"\nDetail metrics check: breakdown={has_details}, pace={has_pace}, drift={has_drift}")
-                if "MOST RECENT WORKOUT" in prompt:
-                    idx = prompt.index("MOST RECENT WORKOUT")
-                    print(f"Recent workout section:\n{prompt[idx:idx+1500]}")
-
-            # At minimum, check that detail metrics are present
-            assert has_details and has_pace and has_drift, "Detail metrics should be in prompt"
-
-            return SimpleNamespace(
-                content=[SimpleNamespace(text=json.dumps(sample_ai_payload))]
-            )
-
-    class DummyAnthropic:
-        def __init__(self, api_key: str):
-            self.messages = DummyMessages()
-
-    monkeypatch.setattr("app.services.ai_analyzer.Anthropic", DummyAnthropic)
+    prompts = install_stub_analyzer(
+        monkeypatch, None, _SAMPLE_AI_TEXT, garmin_service=_DummyGarminService
+    )
 
     # Don't mock _fetch_garmin_data - let it run with the mocked GarminClient
     # This ensures the real integration flow runs:
@@ -203,26 +188,18 @@ async def test_ai_analyzer_with_detail_metrics(monkeypatch: pytest.MonkeyPatch,
     def fake_has_historical(self, target_date):
         return False
 
-    def fake_get_historical(self, target_date):
-        return None
-
     monkeypatch.setattr(AIAnalyzer, "_has_historical_data", fake_has_historical)
-    monkeypatch.setattr(AIAnalyzer, "_get_historical_baselines", fake_get_historical)
-
-    # Mock helper methods
-    def fake_readiness_history(self, target_date, days=7):
-        return []
-
-    def fake_latest_sync(self):
-        return None
-
-    monkeypatch.setattr(AIAnalyzer, "_get_readiness_history", fake_readiness_history)
-    monkeypatch.setattr(AIAnalyzer, "_get_latest_metric_sync", fake_latest_sync)
 
     # Run the analysis
     analyzer = AIAnalyzer()
     result = await analyzer.analyze_daily_readiness(date(2025, 1, 15))
 
+    # Verify that detail metrics are in the prompt
+    prompt = prompts[0]
+    assert "DETAILED PERFORMANCE BREAKDOWN" in prompt
+    assert re.search(r"pace consistency", prompt, re.IGNORECASE)
+    assert re.search(r"hr drift", prompt, re.IGNORECASE)
+
     # Verify integration worked
     assert result["readiness_score"] == 78
     assert result["recommendation"] == "moderate"
@@ -246,18 +223,9 @@ def test_fetch_activity_detail_metrics_not_cached():
     pass
 
 
-def test_format_recent_workout_analysis_with_details(monkeypatch):
+def test_format_recent_workout_analysis_with_details():
     """Test that workout formatting includes detail metrics when available."""
 
-    class DummySettings:
-        anthropic_api_key = "test-key"
-        garmin_email = "test@example.com"
-        garmin_password = "hunter2"
-        garmin_token_store = None
-        prompt_config_path = Path("app/config/prompts.yaml")
-
-    monkeypatch.setattr("app.services.ai_analyzer.get_settings", lambda: DummySettings())
-
     analyzer = AIAnalyzer()
 
     recent_workout = {
@@ -304,18 +272,9 @@ def test_format_recent_workout_analysis_with_details(monkeypatch):
     assert "Splits: Even splits" in result
 
 
-def test_format_recent_workout_analysis_without_details(monkeypatch):
+def test_format_recent_workout_analysis_without_details():
     """Test that workout formatting works without detail metrics (Phase 1 fallback)."""
 
-    class DummySettings:
-        anthropic_api_key = "test-key"
-        garmin_email = "test@example.com"
-        garmin_password = "hunter2"
-        garmin_token_store = None
-        prompt_config_path = Path("app/config/prompts.yaml")
-
-    monkeypatch.setattr("app.services.ai_analyzer.get_settings", lambda: DummySettings())
-
     analyzer = AIAnalyzer()
 
     recent_workout = {
@@ -354,8 +313,24 @@ def test_format_recent_workout_analysis_without_details(monkeypatch):
     assert "DETAILED PERFORMANCE BREAKDOWN" not in result
 
 
-@pytest.mark.asyncio
-async def test_recovery_time_integration_with_ai_analyzer(monkeypatch):
+@pytest.fixture
+def recovery_metric_date(test_date):
+    """Store the fixture's DailyMetric row for ``test_date`` and delete it afterwards."""
+    with SessionLocal() as db:
+        db.execute(insert(DailyMetric).values(date=test_date, **_FIXTURE_METRIC_ROW))
+        db.commit()
+
+    yield test_date
+
+    with SessionLocal() as db:
+        db.execute(delete(DailyMetric).where(DailyMetric.date == test_date))
+        db.commit()
+
+
+# The analyzer's response cache is process-wide; no other test analyzes these
+# dates, so each case misses the cache without clearing it.
+@pytest.mark.parametrize("test_date", [date(2025, 10, 28), date(2025, 10, 29)])
+async def test_recovery_time_integration_with_ai_analyzer(monkeypatch, recovery_metric_date):
     """Integration test: Verify recovery time flows from fixture to AI analyzer.
 
     This test verifies the complete data flow:
@@ -363,135 +338,12 @@ async def test_recovery_time_integration_with_ai_analyzer(monkeypatch):
     2. Sync would store this as recovery_time_hours in database
     3. AI analyzer accesses and uses this data in recommendations
     """
-    from app.database import SessionLocal
-    from app.models.database_models import DailyMetric
-
-    # Setup test configuration
-    class DummySettings:
-        anthropic_api_key = "test-key"
-        garmin_email = "test@example.com"
-        garmin_password = "hunter2"
-        garmin_token_store = None
-        prompt_config_path = Path("app/config/prompts.yaml")
-
-    monkeypatch.setattr("app.services.ai_analyzer.get_settings", lambda: DummySettings())
-
-    # Store test data in database (simulating sync_data.py)
-    db = SessionLocal()
-    test_date = date(2025, 10, 17)
-    try:
-        # Clean existing data
-        existing = db.query(DailyMetric).filter(DailyMetric.date == test_date).first()
-        if existing:
-            db.delete(existing)
-            db.commit()
-
-        # Create metric with recovery time from fixture
-        metric = DailyMetric(
-            date=test_date,
-            recovery_time_hours=14,  # From fixtures/garmin_daily_metrics.json
-            resting_hr=44,
-            hrv_morning=48,
-            sleep_seconds=25500,
-            sleep_score=82,
-            training_readiness_score=67,
-            vo2_max=54.3,
-            training_status="PRODUCTIVE",
-        )
-        db.add(metric)
-        db.commit()
-    finally:
-        db.close()
-
-    # Mock Garmin data fetch to return fixture data
-    def mock_fetch_garmin_data(self, garmin, target_date):
-        return {
-            "stats": {"totalSteps": 12345},
-            "heart_rate": {"restingHeartRate": 44},
-            "hrv": {"hrvSummary": {"lastNightAvg": 48}},
-            "sleep": {
-                "dailySleepDTO": {
-                    "sleepTimeSeconds": 25500,
-                    "sleepScores": {"overall": {"value": 82}},
-                }
-            },
-            "training_readiness": [{"score": 67}],
-            "training_status": {
-                "currentRecoveryTime": 14,  # Fixture value
-                "mostRecentVO2Max": {"generic": {"vo2MaxValue": 54.3}},
-                "mostRecentTrainingStatus": {
-                    "latestTrainingStatusData": {
-                        "device1": {"trainingStatusFeedbackPhrase": "PRODUCTIVE"}
-                    }
-                },
-            },
-            "recent_activities": [],
-        }
-
-    monkeypatch.setattr(AIAnalyzer, "_fetch_garmin_data", mock_fetch_garmin_data)
-
-    # Mock dependencies
-    monkeypatch.setattr(
-        AIAnalyzer,
-        "_calculate_baselines",
-        lambda self, data: {
-            "avg_training_load": 30,
-            "activity_count": 0,
-            "total_distance_km": 0,
-            "total_duration_min": 0,
-            "activity_breakdown": {},
-        },
-    )
-    monkeypatch.setattr(AIAnalyzer, "_has_historical_data", lambda self, target_date: False)
-    monkeypatch.setattr(AIAnalyzer, "_get_readiness_history", lambda self, target_date, days=7: [])
-    monkeypatch.setattr(AIAnalyzer, "_get_latest_metric_sync", lambda self: None)
-
-    # Mock Anthropic to verify recovery time in prompt
-    verification_passed = False
-
-    class DummyMessages:
-        def create(self, **kwargs):
-            nonlocal verification_passed
-            prompt = kwargs["messages"][0]["content"]
-
-            # Verify recovery time is in the prompt
-            has_recovery = "Recovery time remaining" in prompt or "recovery" in prompt.lower()
-            has_value = "14" in prompt or "14.0h" in prompt
-
-            if has_recovery and has_value:
-                verification_passed = True
-
-            return SimpleNamespace(
-                content=[
-                    SimpleNamespace(
-                        text=json.dumps({
-                            "readiness_score": 70,
-                            "recommendation": "moderate",
-                            "confidence": "high",
-                            "key_factors": [
-                                "Recovery time: 14 hours - moderate intensity recommended"
-                            ],
-                            "suggested_workout": {
-                                "type": "easy_run",
-                                "description": "30 min easy run",
-                                "target_duration_minutes": 30,
-                            },
-                        })
-                    )
-                ]
-            )
-
-    class DummyAnthropic:
-        def __init__(self, api_key: str):
-            self.messages = DummyMessages()
-
-    monkeypatch.setattr("app.services.ai_analyzer.Anthropic", DummyAnthropic)
+    # Garmin, Anthropic and historical lookups are stubbed; stored metrics are real
+    captured_prompts = install_stub_analyzer(monkeypatch, _RECOVERY_GARMIN_DATA, _RECOVERY_AI_TEXT)
 
     # Run analysis
     analyzer = AIAnalyzer()
-    # Clear cache to ensure fresh analysis
-    analyzer._response_cache.clear()
-    result = await analyzer.analyze_daily_readiness(test_date)
+    result = await analyzer.analyze_daily_readiness(recovery_metric_date)
 
     # Verify recovery time appears in result
     assert result is not None
@@ -500,53 +352,21 @@ async def test_recovery_time_integration_with_ai_analyzer(monkeypatch):
     assert result["extended_signals"]["recovery_time"]["hours"] == 14
 
     # Verify recovery time was sent to AI in prompt
-    assert verification_passed, "Recovery time should be included in AI prompt"
-
-    # Cleanup
-    db = SessionLocal()
-    try:
-        metric = db.query(DailyMetric).filter(DailyMetric.date == test_date).first()
-        if metric:
-            db.delete(metric)
-            db.commit()
-    finally:
-        db.close()
+    prompt = captured_prompts[0]
+    assert re.search(r"recovery", prompt, re.IGNORECASE), "Recovery time should be included in AI prompt"
+    assert "14" in prompt
 
 
-def test_recovery_time_stored_matches_fixture():
+def test_recovery_time_stored_matches_fixture(db_session):
     """Verify stored recovery_time_hours matches fixture data value of 14."""
-    from app.database import SessionLocal
-    from app.models.database_models import DailyMetric
-
-    db = SessionLocal()
     test_date = date(2025, 10, 27)
-    try:
-        # Clean existing
-        existing = db.query(DailyMetric).filter(DailyMetric.date == test_date).first()
-        if existing:
-            db.delete(existing)
-            db.commit()
-
-        # Simulate what sync_data.py does with fixture data
-        # Fixture has: "currentRecoveryTime": 14
-        metric = DailyMetric(
-            date=test_date,
-            recovery_time_hours=14,
-            resting_hr=44,
-            hrv_morning=48,
-        )
-        db.add(metric)
-        db.commit()
 
-        # Query back
-        retrieved = db.query(DailyMetric).filter(DailyMetric.date == test_date).first()
+    # Simulate what sync_data.py does with fixture data (rolled back after the test)
+    # Fixture has: "currentRecoveryTime": 14
+    db_session.execute(insert(DailyMetric).values(date=test_date, **_STORED_METRIC_ROW))
+    db_session.commit()
 
-        assert retrieved is not None
-        assert retrieved.recovery_time_hours == 14, \
-            "Stored recovery_time_hours should match fixture value"
-
-        # Cleanup
-        db.delete(retrieved)
-        db.commit()
-    finally:
-        db.close()
+    recovery_time_hours = db_session.execute(
+        select(DailyMetric.recovery_time_hours).where(DailyMetric.date == test_date)
+    ).scalar_one()
+    assert recovery_time_hours == 14, "Stored recovery_time_hours should match fixture value"
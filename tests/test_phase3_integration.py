@@ -1,36 +1,46 @@
 """Integration smoke tests for Phase 3 Web Interface features."""
 from __future__ import annotations
 
+import re
+
 import pytest
 from fastapi.testclient import TestClient
 
+# Case-insensitive page markers, matched in one pass over the raw response bytes
+_DASHBOARD_RE = re.compile(rb"training", re.IGNORECASE)
+_CHAT_RE = re.compile(rb"chat|ai coach", re.IGNORECASE)
+_INSIGHTS_RE = re.compile(rb"insights|analytics", re.IGNORECASE)
+_TRAINING_PLAN_RE = re.compile(rb"training plan|calendar", re.IGNORECASE)
+_NAV_RE = re.compile(rb"nav", re.IGNORECASE)
+_FOOTER_RE = re.compile(rb"footer|2025", re.IGNORECASE)
+
 
 def test_dashboard_page_loads(test_client: TestClient):
     """Test that dashboard page loads successfully."""
     response = test_client.get("/")
     assert response.status_code == 200
-    assert b"Training Optimizer" in response.content or b"training" in response.content.lower()
+    assert _DASHBOARD_RE.search(response.content)
 
 
 def test_chat_page_loads(test_client: TestClient):
     """Test that chat interface page loads."""
     response = test_client.get("/chat")
     assert response.status_code == 200
-    assert b"chat" in response.content.lower() or b"ai coach" in response.content.lower()
+    assert _CHAT_RE.search(response.content)
 
 
 def test_insights_page_loads(test_client: TestClient):
     """Test that analytics insights page loads."""
     response = test_client.get("/insights")
     assert response.status_code == 200
-    assert b"insights" in response.content.lower() or b"analytics" in response.content.lower()
+    assert _INSIGHTS_RE.search(response.content)
 
 
 def test_training_plan_page_loads(test_client: TestClient):
     """Test that training plan page loads."""
     response = test_client.get("/training-plan")
     assert response.status_code == 200
-    assert b"training plan" in response.content.lower() or b"calendar" in response.content.lower()
+    assert _TRAINING_PLAN_RE.search(response.content)
 
 
 def test_all_pages_use_base_template(test_client: TestClient):
@@ -42,11 +52,10 @@ def test_all_pages_use_base_template(test_client: TestClient):
         assert response.status_code == 200
 
         # Check for navigation elements
-        content = response.content.lower()
-        assert b"nav" in content or b"navigation" in content
+        assert _NAV_RE.search(response.content)
 
         # Check for footer
-        assert b"footer" in content or b"2025" in content
+        assert _FOOTER_RE.search(response.content)
 
 
 def test_navigation_links_exist(test_client: TestClient):
@@ -63,34 +72,23 @@ def test_navigation_links_exist(test_client: TestClient):
     assert b"AI Coach" in content or b"chat" in content or b"Coach" in content
 
 
-def test_static_css_files_accessible(test_client: TestClient):
-    """Test that CSS files are accessible."""
-    css_files = [
+@pytest.mark.parametrize(
+    "path",
+    [
         "/static/css/base.css",
         "/static/css/dashboard.css",
-    ]
-
-    for css_file in css_files:
-        response = test_client.get(css_file)
-        # Should either exist (200) or if file doesn't exist, we'll get 404
-        # This is okay - just checking the static file route works
-        assert response.status_code in [200, 404]
-
-
-def test_static_js_files_accessible(test_client: TestClient):
-    """Test that JavaScript files are accessible."""
-    js_files = [
         "/static/js/base.js",
         "/static/js/dashboard.js",
         "/static/js/chat.js",
         "/static/js/insights.js",
         "/static/js/training_plan.js",
-    ]
-
-    for js_file in js_files:
-        response = test_client.get(js_file)
-        # Should either exist (200) or 404 if not created yet
-        assert response.status_code in [200, 404]
+    ],
+)
+def test_static_assets_route_mounted(test_client: TestClient, path: str):
+    """Test that the static file route serves CSS/JS assets."""
+    response = test_client.get(path)
+    # Either the file exists (200) or static mounting works (returns 404, not 500)
+    assert response.status_code in [200, 404]
 
 
 def test_dark_mode_css_variables_exist(test_client: TestClient):
@@ -156,15 +154,6 @@ def test_no_server_errors_on_page_loads(test_client: TestClient):
         assert response.status_code < 500, f"Page {page} returned {response.status_code}"
 
 
-def test_favicon_or_static_assets(test_client: TestClient):
-    """Test that static file mounting works."""
-    # Test that static route is mounted
-    response = test_client.get("/static/css/dashboard.css")
-
-    # Either the file exists (200) or static mounting works (returns 404, not 500)
-    assert response.status_code in [200, 404]
-
-
 def test_navigation_active_link_highlighting(test_client: TestClient):
     """Test that pages include active navigation state."""
     response = test_client.get("/insights")
@@ -3,50 +3,74 @@ from __future__ import annotations
 
 import os
 from datetime import date
+from types import SimpleNamespace
 from typing import Any, Dict
 
 import pytest
 
 os.environ.setdefault("SECRET_KEY", "test-secret-key")
 
+from app.config import get_settings
+from app.services import ai_analyzer
+from app.services.ai_analyzer import AIAnalyzer
 from scripts import run_scheduler
 
 
-@pytest.mark.asyncio
-async def test_run_daily_job_invokes_sync_and_analysis(monkeypatch):
-    recorded: Dict[str, Any] = {}
+def _fake_sync_success() -> Dict[str, Dict[str, Any]]:
+    return {date.today().isoformat(): {"metrics": "saved", "activities_saved": 1, "activities_skipped": 0}}
 
-    def fake_sync() -> Dict[str, Dict[str, Any]]:
-        recorded["sync_called"] = True
-        return {date.today().isoformat(): {"metrics": "saved", "activities_saved": 1, "activities_skipped": 0}}
 
-    async def fake_analyze(self, target_date: date, locale: str | None = None) -> Dict[str, Any]:
-        recorded["analyze_target"] = target_date
-        return {"readiness_score": 75, "recommendation": "moderate", "confidence": "medium"}
+def _fake_sync_failure() -> Dict[str, Dict[str, Any]]:
+    raise RuntimeError("boom")
 
-    monkeypatch.setattr(run_scheduler, "perform_daily_sync", fake_sync)
-    monkeypatch.setattr(run_scheduler.AIAnalyzer, "analyze_daily_readiness", fake_analyze)
 
-    await run_scheduler.run_daily_job()
+@pytest.fixture(scope="module", autouse=True)
+def _stub_analyzer_setup():
+    """Build every analyzer in the module from one parsed prompt config and no API client."""
+    prompt_config = AIAnalyzer._load_prompt_config(get_settings().prompt_config_path)
 
-    assert recorded["sync_called"] is True
-    assert recorded["analyze_target"] == date.today()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(ai_analyzer, "Anthropic", lambda api_key: SimpleNamespace(messages=None))
+        mp.setattr(AIAnalyzer, "_load_prompt_config", staticmethod(lambda path: prompt_config))
+        yield
 
 
-@pytest.mark.asyncio
-async def test_run_daily_job_stops_when_sync_fails(monkeypatch):
-    called = {"analyze": False}
+@pytest.fixture
+def patched_scheduler(monkeypatch):
+    """Patch the sync and analysis steps of the daily job, recording what runs."""
+    recorded: Dict[str, Any] = {}
 
-    def fake_sync_failure() -> Dict[str, Dict[str, Any]]:
-        raise RuntimeError("boom")
+    def set_sync(fake_sync) -> None:
+        def recording_sync() -> Dict[str, Dict[str, Any]]:
+            recorded["sync_called"] = True
+            return fake_sync()
+
+        monkeypatch.setattr(run_scheduler, "perform_daily_sync", recording_sync)
 
     async def fake_analyze(self, target_date: date, locale: str | None = None) -> Dict[str, Any]:
-        called["analyze"] = True
-        return {}
+        recorded["analyze_target"] = target_date
+        return {"readiness_score": 75, "recommendation": "moderate", "confidence": "medium"}
 
-    monkeypatch.setattr(run_scheduler, "perform_daily_sync", fake_sync_failure)
-    monkeypatch.setattr(run_scheduler.AIAnalyzer, "analyze_daily_readiness", fake_analyze)
+    monkeypatch.setattr(AIAnalyzer, "analyze_daily_readiness", fake_analyze)
+    return SimpleNamespace(recorded=recorded, set_sync=set_sync)
+
+
+@pytest.mark.parametrize(
+    "sync_outcome,expect_analyze_called",
+    [
+        (_fake_sync_success, True),
+        (_fake_sync_failure, False),  # Analysis is skipped when the sync fails
+    ],
+    ids=["sync_succeeds", "sync_fails"],
+)
+async def test_run_daily_job(patched_scheduler, sync_outcome, expect_analyze_called):
+    patched_scheduler.set_sync(sync_outcome)
 
     await run_scheduler.run_daily_job()
 
-    assert called["analyze"] is False
+    recorded = patched_scheduler.recorded
+    assert recorded["sync_called"] is True
+    if expect_analyze_called:
+        assert recorded["analyze_target"] == date.today()
+    else:
+        assert "analyze_target" not in recorded
@@ -1,11 +1,18 @@
 """Unit tests for TrainingPlanner stub."""
 from datetime import date
 
+import pytest
+
 from app.services.training_planner import TrainingPlanner
 
 
-def test_generate_plan_returns_structure():
-    planner = TrainingPlanner()
-    plan = planner.generate_plan("5k", date.today())
-    assert plan["goal"] == "5k"
+@pytest.fixture(scope="module")
+def planner() -> TrainingPlanner:
+    return TrainingPlanner()
+
+
+@pytest.mark.parametrize("goal", ["5k", "10k", "half_marathon", "marathon", "general_fitness"])
+def test_generate_plan_returns_structure(planner, goal):
+    plan = planner.generate_plan(goal, date.today())
+    assert plan["goal"] == goal
     assert "weeks" in plan